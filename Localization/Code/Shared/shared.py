@@ -218,7 +218,11 @@ def read_file(file_path, encoding='utf-8'):
         result = temp_file.read()
     
     return result
+
+def read_file_bytes(file_path):
     
+    with open(file_path, 'rb') as file:
+        return file.read()
 
 def read_tempfile(temp_file_path, remove=True):
     
@@ -245,13 +249,21 @@ def is_file_empty(file_path):
 
 def runCLT(command, cwd=None, exec='/bin/bash'):
     
+    """
+    `command` can be a string, which is run through the `exec` shell, or a list of args, which is run directly without a shell.
+        Passing a list is nice for long commands with many file paths, since we don't have to escape anything and the shell doesn't have to parse the whole thing.
+    """
+    
+    is_shell = isinstance(command, str)
+    command_str = command if is_shell else ' '.join(command) # For checks and error messages
+    
     success_codes=[0]
-    if command.startswith('git diff'): 
+    if command_str.startswith('git diff'): 
         success_codes.append(1) # Git diff returns 1 if there's a difference
     
-    clt_result = subprocess.run(command, cwd=cwd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, executable=exec) # Not sure what `text` and `shell` does. We use cwd to run git commands at a differnt repo than the current workding directory
+    clt_result = subprocess.run(command, cwd=cwd, shell=is_shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, executable=(exec if is_shell else None)) # Not sure what `text` and `shell` does. We use cwd to run git commands at a differnt repo than the current workding directory
     
-    assert clt_result.stderr == '' and clt_result.returncode in success_codes, f"Command \"{command}\", run in cwd \"{cwd}\"\n--- stderr:\n{clt_result.stderr}\n--- code:\n{clt_result.returncode}\n--- stdout:\n{clt_result.stdout}"
+    assert clt_result.stderr == '' and clt_result.returncode in success_codes, f"Command \"{command_str}\", run in cwd \"{cwd}\"\n--- stderr:\n{clt_result.stderr}\n--- code:\n{clt_result.returncode}\n--- stdout:\n{clt_result.stdout}"
     
     return clt_result
 
@@ -325,14 +337,16 @@ def find_files_with_extensions(exts, excluded_paths):
     We used to use a neat glob pattern in our subprocess call `./**/*.{m,c,cpp,mm,swift}`, but that also caught python package .c files, and idk how to exclude them.
         The .c files didn't actually cause obvious problems (because they don't contain NSLocalizedString() macros anyways) but I hope this will make things a bit faster.
         (Didn't test if it's actually faster)
+    - We used to glob once per extension, but that walks the whole repo each time. Now we glob once and sort the paths by extension afterwards. 
+        The order of the result is still the same - all paths for the first extension, then all paths for the second extension, etc.
     """
     
+    all_paths = glob.glob('./**/*', recursive=True)
+    all_paths = [path for path in all_paths if not any(exc in path for exc in excluded_paths)]
+    
     paths = []
     for ext in exts:
-        pattern = f'./**/*.{ext}'
-        f = glob.glob(pattern, recursive=True)
-        ff = [path for path in f if not any(exc in path for exc in excluded_paths)]
-        paths += ff
+        paths += [path for path in all_paths if path.endswith(f'.{ext}')]
     
     # Return
     return paths
@@ -377,7 +391,8 @@ def find_localization_files(repo_root, website_root=None, basetypes=['IB', 'stri
     
     markdown_dir = repo_root + '/' + "Markdown/Templates"
     exclude_paths_relative = ["Frameworks/Sparkle.framework"]
-    exclude_paths = list(map(lambda exc: repo_root + '/' + exc, exclude_paths_relative))
+    exclude_paths = set(map(lambda exc: repo_root + '/' + exc, exclude_paths_relative))
+    exclude_dirnames = set(['venv', 'env']) # Python environments. (The Xcode build phase for UpdateStrings creates a venv in the repo root)
     
     # Get repos
     mmf_repo = git.Repo(repo_root)
@@ -409,7 +424,7 @@ def find_localization_files(repo_root, website_root=None, basetypes=['IB', 'stri
     #   Note: We do this last because in the analysis we iterate through the `result` dict in insertion order, and analyzing the IB stuff is the slowest. So doing this last makes debugging more convenient.
     if set(['IB', 'strings', 'stringsdict']) & set(basetypes):
         for root, dirs, files in os.walk(repo_root):
-            dirs[:] = [d for d in dirs if root + '/' + d not in exclude_paths]
+            dirs[:] = [d for d in dirs if root + '/' + d not in exclude_paths and d not in exclude_dirnames and not d.startswith('.')] # Prune in-place so os.walk doesn't go into these at all. (Hidden folders include .git, which is huge)
             is_en_folder = 'en.lproj' in os.path.basename(root)
             is_base_folder = 'Base.lproj' in os.path.basename(root)
             if is_base_folder or is_en_folder:
@@ -30,6 +30,13 @@ Manual testing steps:
 
 import sys
 import os
+import shutil
+import re
+import concurrent.futures
+import hashlib
+import json
+import io
+import functools
 from pprint import pprint
 import argparse
 
@@ -49,6 +56,24 @@ from Shared import shared
 #
 
 temp_folder = './update_comments_temp'
+cache_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), '.update_strings_cache.json') # See load_cache()
+parse_cache_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), '.strings_parse_cache.json') # See load_parse_cache()
+min_files_for_process_pool = 32 # See update_strings_files_with_generated_content()
+script_hash = hashlib.blake2b(shared.read_file_bytes(os.path.realpath(__file__)) + shared.read_file_bytes(os.path.realpath(shared.__file__)), digest_size=16).digest() # See get_generated_hash(). Note: We also hash shared.py since the strings file regexes live there.
+
+# Regexes for parse_strings_file_content()
+#   Notes: 
+#   - We compile these once here, since parse_strings_file_content() is called a bunch of times per run.
+#   - We apply the regexes to the whole content of a .strings file instead of line-by-line. But the `\s` in the shared regexes also matches linebreaks, which would let a match spill over into neighbouring lines. 
+#       So we replace `\s` with `[^\S\n]` (whitespace except linebreak). That way, a match on the whole content is exactly the same as a match on the single line it's in.
+
+def line_local_regex(regex):
+    return re.compile(regex.pattern.replace(r'\s', r'[^\S\n]'), regex.flags)
+
+kv_regex        = line_local_regex(shared.strings_file_regex_kv_line())
+comment_regex   = line_local_regex(shared.strings_file_regex_comment_line())
+blank_regex     = line_local_regex(shared.strings_file_regex_blank_line())
+invalid_line_regex = re.compile(f"^(?!(?:{comment_regex.pattern})|(?:{blank_regex.pattern})).*$", re.MULTILINE) # Matches lines that are neither comment lines nor blank lines
 
 #
 # Main
@@ -57,26 +82,33 @@ temp_folder = './update_comments_temp'
 def main():
     
     # Create temp dir
-    shared.runCLT(f"mkdir -p {temp_folder}")
+    os.makedirs(temp_folder, exist_ok=True)
     
     try:
     
         # Args
         parser = argparse.ArgumentParser()
         parser.add_argument('--wet_run', required=False, action='store_true', help="Provide this arg to actually modify files. Otherwise it will just log what it would do.", default=False)
+        parser.add_argument('--strict', required=False, action='store_true', help="Provide this arg to validate the parsed .strings files even on a dry run. (Always on with --wet_run)", default=False)
         args = parser.parse_args()
         
         # Constants & stuff
         repo_root = os.getcwd()
         assert os.path.basename(repo_root) == 'mac-mouse-fix', "Run this script from the 'mac-mouse-fix' repo folder."
         
+        strict = args.wet_run or args.strict
+        
         # Find files
-        ib_files = shared.find_localization_files(repo_root, None, ['IB'])
-        strings_files = shared.find_localization_files(repo_root, None, ['strings'])
+        #   Note: We only walk the repo once and then split the files by type
+        localization_files = shared.find_localization_files(repo_root, None, ['IB', 'strings'])
+        ib_files = [f for f in localization_files if os.path.splitext(f['base'])[1] in ['.xib', '.storyboard']]
+        strings_files = [f for f in localization_files if os.path.splitext(f['base'])[1] == '.strings']
         
         # Get updates to .strings files
-        updated_files_ib, modss_ib = update_strings_files(ib_files, 'IB', repo_root)
-        updated_files_src, modss_src = update_strings_files(strings_files, 'sourcecode', repo_root)
+        #   Note: We share one process pool between both calls, so we don't start worker processes twice. The pool only starts its workers once something is submitted to it. (See update_strings_files_with_generated_content())
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            updated_files_ib, modss_ib = update_strings_files(ib_files, 'IB', repo_root, executor, strict)
+            updated_files_src, modss_src = update_strings_files(strings_files, 'sourcecode', repo_root, executor, strict)
         updated_files = updated_files_ib + updated_files_src
         
         # Log
@@ -89,9 +121,14 @@ def main():
         # Write 
         if args.wet_run and len(updated_files) > 0:
             print('\n\n')
-            for w in updated_files:
-                print(f"Writing to file at {w['path']}...")
-                shared.write_file(w['path'], w['new_content'])
+            with concurrent.futures.ThreadPoolExecutor() as executor: # Writing is IO-bound, so threads are fine here.
+                futures = []
+                for w in updated_files:
+                    print(f"Writing to file at {w['path']}...")
+                    futures.append(executor.submit(shared.write_file, w['path'], w['new_content']))
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+                for future in done:
+                    future.result() # Re-raise exceptions from the writer threads
         else:
             print(f"\n\nNot writing anything. {len(updated_files_ib)} ib files and {len(updated_files_src)} src files with updates. Is dry run: {not args.wet_run}.")
         
@@ -105,13 +142,13 @@ def main():
         print("Done! Cleaning up temp folder and exiting...")
         
         # Clean up
-        shared.runCLT(f"rm -R ./{temp_folder}")
+        shutil.rmtree(temp_folder, ignore_errors=True)
     
 #
 # Update .strings files
 #
 
-def update_strings_files(files, type, repo_root):
+def update_strings_files(files, type, repo_root, executor, strict=True):
     
     """
     (if type == 'sourcecode')   Update .strings files to match source code files which they translate
@@ -122,50 +159,279 @@ def update_strings_files(files, type, repo_root):
       But in this function, we also update en.lproj/Localizable.strings. Maybe we should've specified development language values directly in the source code using `NSLocalizedStringWithDefaultValue` instead of inside en.lproj. That way we wouldn't need en.lproj at all.
       Not sure anymore why we chose to do it with en.lproj instead of all source code for English. But either way, I don't think it's worth it to change now.
     Note:
+    - The type-specific stuff happens in update_strings_files_sourcecode() and update_strings_files_ib(). This just dispatches to them.
     """
     
     print(f"\nUpdating strings files type {type}...")
     
-    assert type in ['sourcecode', 'IB'], f"UpdateStrings script is incorrect."
-    if type == 'sourcecode': xcassert(len(files) == 1, "There should only be one base .strings file - Localizable.strings")
+    if type == 'sourcecode':
+        return update_strings_files_sourcecode(files, repo_root, executor, strict)
+    elif type == 'IB':
+        return update_strings_files_ib(files, repo_root, executor, strict)
+    else:
+        assert False, f"UpdateStrings script is incorrect."
+
+def update_strings_files_sourcecode(files, repo_root, executor, strict):
     
-    updated_files = [] # This is for updating files
-    modss = [] # This is for debugging
+    xcassert(len(files) == 1, "There should only be one base .strings file - Localizable.strings")
+    file_dict = files[0]
+    
+    # Extract strings from source code
+    #   Note: This only depends on the source code in the repo, not on the file_dict, so we only do it once. Scanning the whole codebase with `extractLocStrings` is by far the slowest part of this.
+    source_code_files = find_source_code_files(('m','c','cp','mm','swift'), ('env/', 'venv/', 'iOS-Polynomial-Regression-master/', './Test/'))
+    shared.runCLT(['xcrun', 'extractLocStrings', *source_code_files, '-SwiftUI', '-o', temp_folder]) # Pass args directly instead of going through zsh, so we don't have to escape the paths
+    generated_path = f"{temp_folder}/Localizable.strings"
+    generated_content = shared.read_file(generated_path, 'utf-16')
+    
+    # Update
+    #   Note: Unlike with IB files, we also update the development language file (See update_strings_files())
+    translation_file_paths = list(file_dict['translations'].keys()) + [file_dict['base']]
+    jobs = [(file_dict['base'], generated_content, translation_file_paths)]
     
+    return update_strings_files_with_generated_content(jobs, repo_root, executor, strict)
+
+def update_strings_files_ib(files, repo_root, executor, strict):
+    
+    # Extract strings from IB files
+    jobs = []
     for file_dict in files:
+        generated_path = shared.extract_strings_from_IB_file_to_temp_file(file_dict['base'])
+        generated_content = shared.read_tempfile(generated_path)
+        jobs.append((file_dict['base'], generated_content, list(file_dict['translations'].keys())))
     
-        generated_content = ''
-        if type == 'sourcecode':
-            source_code_files = shared.find_files_with_extensions(['m','c','cp','mm','swift'], ['env/', 'venv/', 'iOS-Polynomial-Regression-master/', './Test/'])
-            source_code_files_str = ' '.join(map(lambda p: p.replace(' ', r'\ '), source_code_files))
-            shared.runCLT(f"xcrun extractLocStrings {source_code_files_str} -SwiftUI -o ./{temp_folder}", exec='/bin/zsh')
-            generated_path = f"{temp_folder}/Localizable.strings"
-            generated_content = shared.read_file(generated_path, 'utf-16')
-        elif type == 'IB':
-            base_file_path = file_dict['base']
-            generated_path = shared.extract_strings_from_IB_file_to_temp_file(base_file_path)
-            generated_content = shared.read_tempfile(generated_path)
-        else: 
-            assert False
-        
-        translation_file_paths = list(file_dict['translations'].keys())
-        if type == 'sourcecode':
-            translation_file_paths.append(file_dict['base'])
-        
-        for path in translation_file_paths:
-            
-            content = shared.read_file(path, 'utf-8')
-            new_content, mods, ordered_keys = updated_strings_file_content(content, generated_content, path, repo_root)
-            
-            if new_content != content:
-                updated_files.append({"path": path, "new_content": new_content})
-            
-            modss.append({'path': path, 'mods': mods, 'ordered_keys': ordered_keys})
+    # Update
+    return update_strings_files_with_generated_content(jobs, repo_root, executor, strict)
 
+def update_strings_files_with_generated_content(jobs, repo_root, executor, strict):
+    
+    """
+    Update .strings files to match the generated content.
+    `jobs` is a list of tuples: (<base_file_path>, <generated_content>, [<path_of_strings_file_to_update>, ...])
+    `executor` is a ProcessPoolExecutor. We only use it if there are enough files to update. (See min_files_for_process_pool)
+    """
+    
+    updated_files = [] # This is for updating files
+    modss = [] # This is for debugging
+    work = [] # Args for update_strings_file()
+    entries = [] # (<path>, <content_hash>, <cache_key>, <index into work>)
+    cache = load_cache()
+    parse_cache = load_parse_cache()
+    
+    for base_file_path, generated_content, translation_file_paths in jobs:
+        
+        # Skip files that were already in sync with this generated_content last time
+        generated_hash = get_generated_hash(generated_content)
+        cache_keys = { path: get_cache_key(path, generated_hash) for path in translation_file_paths }
+        translation_file_paths = [path for path in translation_file_paths if not is_cached(cache, path, cache_keys[path])]
+        if len(translation_file_paths) == 0:
+            continue
+        
+        generated_parse = parse_generated_strings_file_content(generated_content, base_file_path) # Parse this once here instead of once for every translation file
+        
+        # Group identical files
+        #   Note: Some translation files are byte-for-byte identical (e.g. if nothing has been translated yet). The result is the same for all of them, so we only process one file per group.
+        #       We don't group development language files, because updated_strings_file_content() prints warnings for those, which should point to the right file. (See get_group_id())
+        groups = {}
+        for path in translation_file_paths:
+            content_bytes = shared.read_file_bytes(path)
+            content_hash = get_content_hash(content_bytes)
+            group_id = get_group_id(path, content_hash)
+            if group_id not in groups:
+                identical_paths = []
+                groups[group_id] = (len(work), identical_paths)
+                work.append((path, content_bytes, content_hash, generated_parse, repo_root, strict, identical_paths, get_cached_parse(parse_cache, path, content_hash)))
+            else:
+                groups[group_id][1].append(path)
+            entries.append((path, content_hash, cache_keys[path], groups[group_id][0]))
+    
+    # Update the translation files
+    #   Note: Each translation file can be updated independently, and parsing is pure python, so we use processes instead of threads to get around the GIL.
+    #       But starting the worker processes is slow (they have to re-import this script and GitPython), so if only a few files aren't cached, we just update them in this process.
+    if len(work) >= min_files_for_process_pool:
+        futures = [executor.submit(update_strings_file, *args) for args in work]
+        results = [future.result() for future in futures] # If a worker called xcerror(), this re-raises its SystemExit here.
+    else:
+        results = [update_strings_file(*args) for args in work]
+    
+    # Update parse cache
+    for args, result in zip(work, results):
+        path, content_hash, parse = args[0], args[2], result[-1]
+        parse_cache[path] = { 'key': get_parse_cache_key(content_hash), 'parse': parse }
+    save_parse_cache(parse_cache)
+    
+    # Collect results
+    #   Note: We iterate in the order of the paths, so the order of the results doesn't depend on which worker finishes first.
+    for path, content_hash, cache_key, i in entries:
+        
+        content, new_content, mods, ordered_keys, _ = results[i]
+        
+        if new_content != content:
+            updated_files.append({"path": path, "new_content": new_content})
+        
+        modss.append({'path': path, 'mods': mods, 'ordered_keys': ordered_keys})
+        
+        # Update cache
+        #   Notes:
+        #   - We don't cache development language files, because updated_strings_file_content() prints warnings for those, which we don't want to lose.
+        #   - We only add files to the cache on strict runs. Otherwise a later --wet_run would skip files that have never been validated.
+        if new_content != content or is_development_language_file(path):
+            cache.pop(path, None)
+        elif strict:
+            cache[path] = cache_key + [content_hash]
+    
+    save_cache(cache)
+    
     # Return
     return updated_files, modss
+
+@functools.lru_cache(maxsize=None)
+def find_source_code_files(exts, excluded_paths):
+    # Note: Cached, so we only walk the repo once, no matter how often we need the source code files. Args need to be tuples so they're hashable.
+    return shared.find_files_with_extensions(list(exts), list(excluded_paths))
+
+def update_strings_file(path, content_bytes, content_hash, generated_parse, repo_root, strict=True, identical_paths=(), cached_parse=None):
+    
+    """
+    Get the updated content for a single translation .strings file. 
+    This may be called from the ProcessPoolExecutor workers in update_strings_files_with_generated_content(), so the args and return values need to be picklable.
+    `identical_paths` are the other files with the exact same content as the file at `path`. The result applies to them, too. (See get_group_id())
+    `cached_parse` is the parse from the parse cache, if there is one. (See get_cached_parse())
+    We also return the parse of the unchanged content, so the caller can put it into the parse cache.
+    """
     
+    content = io.TextIOWrapper(io.BytesIO(content_bytes), encoding='utf-8').read() # Same as shared.read_file(path, 'utf-8'), including the newline translation
+    
+    try:
         
+        parse = cached_parse
+        if parse is None:
+            parse = parse_strings_file_content(content, path)
+        
+        parse_copy = { k: dict(v) for k, v in parse.items() } # Copy, since updated_strings_file_content() modifies the parse
+        new_content, mods, ordered_keys = updated_strings_file_content(content, generated_parse, path, repo_root, strict, parse=parse_copy)
+    
+    except SystemExit:
+        # Note: xcerror() only points Xcode to `path`, but the identical files have the same error, so we point Xcode to them, too. Otherwise they'd only fail one by one on later runs.
+        for p in identical_paths:
+            xcode_message("error", p, '', f"This file is identical to {path}, which has the error above.", flush=True)
+        raise
+    
+    return content, new_content, mods, ordered_keys, parse
+
+def is_development_language_file(path):
+    # Note: We check the name of the .lproj folder instead of searching the whole path, since the path is absolute, and the folders above the repo could also contain something like '/en'.
+    return os.path.basename(os.path.dirname(path)) in ('en.lproj', 'Base.lproj') # I think checking for 'Base' here is unnecessary.
+
+def get_group_id(path, content_hash):
+    return path if is_development_language_file(path) else content_hash
+
+#
+# Cache
+#
+
+def load_cache():
+    
+    """
+    The cache remembers which .strings files were already in sync with the generated content on the last run, so we can skip parsing and diffing them.
+    Structure:
+    {
+        "<path_to_strings_file>": [<cache_key from get_cache_key()>..., <content_hash from get_content_hash()>],
+        ...
+    }
+    If the file doesn't exist or is broken, we just start over with an empty cache.
+    """
+    
+    return load_json_cache(cache_path)
+
+def save_cache(cache):
+    shared.write_file(cache_path, json.dumps(cache, indent=2))
+
+def load_parse_cache():
+    
+    """
+    The parse cache stores the result of parse_strings_file_content() for translation files, so we don't have to parse files again that haven't changed.
+        This is for files that aren't skipped by the main cache (see load_cache()) - e.g. because they are out of sync, and we're doing a dry run.
+    Structure:
+    {
+        "<path_to_strings_file>": {
+            "key": <content_hash + hash of this script and shared.py (see script_hash)>,
+            "parse": <result of parse_strings_file_content()>
+        },
+        ...
+    }
+    If the file doesn't exist or is broken, we just start over with an empty cache.
+    """
+    
+    return load_json_cache(parse_cache_path)
+
+def save_parse_cache(parse_cache):
+    # Note: We drop the entries for files that don't exist anymore (e.g. removed locales), so the cache doesn't grow forever. Entries for files that have changed are replaced, since there's only one entry per file.
+    parse_cache = { path: entry for path, entry in parse_cache.items() if os.path.exists(path) }
+    shared.write_file(parse_cache_path, json.dumps(parse_cache))
+
+def get_cached_parse(parse_cache, path, content_hash):
+    # Returns None if there's no valid cached parse.
+    cached = parse_cache.get(path)
+    if not isinstance(cached, dict) or cached.get('key') != get_parse_cache_key(content_hash): # Missing or broken entry
+        return None
+    return cached.get('parse') # Note: json keeps the order of the keys, which the parse relies on.
+
+def load_json_cache(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        cache = json.loads(shared.read_file(path))
+    except ValueError:
+        return {}
+    if not isinstance(cache, dict): # Note: Valid json that's not a dict is just as broken as invalid json.
+        return {}
+    return cache
+
+def get_parse_cache_key(content_hash):
+    # Note: We also hash this script and shared.py (see script_hash), so the cache is invalidated when the parsing logic or the regexes change.
+    return hashlib.blake2b(script_hash + content_hash.encode('utf-8'), digest_size=16).hexdigest()
+
+def get_generated_hash(generated_content):
+    # Note: We also hash this script and shared.py (see script_hash), so the cache is invalidated when the update logic changes.
+    h = hashlib.blake2b(digest_size=16)
+    h.update(script_hash)
+    h.update(generated_content.encode('utf-8'))
+    return h.hexdigest()
+
+def get_content_hash(content_bytes):
+    return hashlib.blake2b(content_bytes, digest_size=16).hexdigest()
+
+def is_cached(cache, path, cache_key):
+    
+    """
+    Check if the file at `path` was in sync with the generated content last time, and hasn't changed since then.
+    Notes:
+    - If the mtime and size are the same, we don't even read the file. 
+    - If only the mtime changed (e.g. because git touched the file), we hash the raw bytes of the file. That's still much cheaper than decoding and parsing it. 
+        If the hash matches, we update the cache_key, so we can skip reading the file next time.
+    """
+    
+    cached = cache.get(path)
+    if not isinstance(cached, list) or len(cached) != len(cache_key) + 1: # Missing or broken entry
+        return False
+    if cached[:-1] == cache_key:
+        return True
+    
+    cached_generated_hash = cached[-2]
+    cached_content_hash = cached[-1]
+    generated_hash = cache_key[-1]
+    if cached_generated_hash != generated_hash:
+        return False
+    if cached_content_hash != get_content_hash(shared.read_file_bytes(path)):
+        return False
+    
+    cache[path] = cache_key + [cached_content_hash]
+    return True
+
+def get_cache_key(path, generated_hash):
+    # Note: If the file is edited, its mtime or size changes. We don't hash the file itself, since reading it is already most of the work we're trying to skip.
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size, generated_hash]
         
 
 #
@@ -180,11 +446,11 @@ def log_modifications(modss):
         but instead it's the position of the kv-pair in the list of kv-pairs in the source file.
     """
     
-    result = ''
+    result = [] # Note: We collect the parts of the output in lists and join them at the end, instead of appending to strings over and over.
     
     for mods in modss:
         
-        path_result = ''
+        path_result = []
         
         keys_before = '\n'.join(mods['ordered_keys']['before'])
         keys_after = '\n'.join(mods['ordered_keys']['after'])
@@ -192,11 +458,16 @@ def log_modifications(modss):
         
         if len(keys_diff) > 0:
             if False: # This sucks. Just use git diff.
-                path_result += f"\n\n    Key order diff:\n{shared.indent(keys_diff, 8)}"
+                path_result.append(f"\n\n    Key order diff:\n{shared.indent(keys_diff, 8)}")
             else: 
-                path_result += f"\\n\n    The order of keys seems to have changed. (I think - this might be broken)"
+                path_result.append(f"\\n\n    The order of keys seems to have changed. (I think - this might be broken)")
                 
-        for mod in sorted(mods['mods'], key=lambda x: x['modtype'], reverse=True):
+        # Show inserts before comment changes
+        inserts = [m for m in mods['mods'] if m['modtype'] == 'insert']
+        comment_changes = [m for m in mods['mods'] if m['modtype'] == 'comment']
+        assert len(inserts) + len(comment_changes) == len(mods['mods']) # There are no other modtypes
+        
+        for mod in inserts + comment_changes:
             
             key = mod['key']
             modtype = mod['modtype']
@@ -206,24 +477,25 @@ def log_modifications(modss):
                 a = mod['after'].strip()
                 
                 if a == b:
-                    path_result += f"\n\n    {key}'s comment whitespace changed"    
+                    path_result.append(f"\n\n    {key}'s comment whitespace changed")    
                 else:
                     a = shared.indent(a, 8)
                     b = shared.indent(b, 8)
                     
-                    path_result += f"\n\n    {key} comment changed:\n{b}\n        ->\n{a}"
+                    path_result.append(f"\n\n    {key} comment changed:\n{b}\n        ->\n{a}")
                 
             elif modtype == 'insert':
                 value = shared.indent(mod['value'], 8)
-                path_result += f"\n\n    {key} was inserted:\n{value}"
-                
-            else: 
-             assert False
+                path_result.append(f"\n\n    {key} was inserted:\n{value}")
+        
+        path_result = ''.join(path_result)
         
         if len(path_result) > 0:
-            result += f"\n\n{mods['path']} was modified:{path_result}\n"
+            result.append(f"\n\n{mods['path']} was modified:{path_result}\n")
         else:
-            result += f"\n{mods['path']} was not modified"
+            result.append(f"\n{mods['path']} was not modified")
+    
+    result = ''.join(result)
     
     if len(result) > 0:
         print(result)
@@ -234,27 +506,15 @@ def log_modifications(modss):
 # String parse & modify
 #
 
-def updated_strings_file_content(content, generated_content, file_path, repo_root):
+def parse_generated_strings_file_content(generated_content, file_path):
     
     """
-    At the time of writing:
-    - Copy over all comments from `generated_content` to `content`
-    - Insert kv-pair + comment from `generated_content` into `content` - if the kv-pair is not found in `content`
-    - Reorder kv-pairs in `content` to match `generated_content`
+    Parse the content generated by `extractLocStrings` or `ibtool` for use in updated_strings_file_content()
     """
     
-    # Parse both contents
-    parse = parse_strings_file_content(content, file_path)
     generated_parse = parse_strings_file_content(generated_content, file_path, remove_value=True) # `extractLocStrings` sets all values to the key for some reason, so we remove them.
     
-    # Record modifications for diagnositics
-    mods = []
-    
-    for key in generated_parse.keys():
-    
-        is_missing = key not in parse        
-        p = None if is_missing else parse[key]
-        g = generated_parse[key]
+    for g in generated_parse.values():
         
         # Replace line sep
         #   Notes: 
@@ -263,11 +523,39 @@ def updated_strings_file_content(content, generated_content, file_path, repo_roo
         
         lsep = "\u2028"
         g['comment'] = g['comment'].replace(lsep, r'\n')
+    
+    return generated_parse
+
+def updated_strings_file_content(content, generated_parse, file_path, repo_root, strict=True, parse=None):
+    
+    """
+    At the time of writing:
+    - Copy over all comments from `generated_parse` to `content`
+    - Insert kv-pair + comment from `generated_parse` into `content` - if the kv-pair is not found in `content`
+    - Reorder kv-pairs in `content` to match `generated_parse`
+    
+    `generated_parse` should come from parse_generated_strings_file_content(). We don't parse it in here, since it's the same for all translations of a base file.
+    If `strict` is False, we skip validating the parse. That's just a sanity check for the parsing code, so we only need it before actually writing files.
+    If `parse` is passed in, it should be the result of parse_strings_file_content(content). It will be modified.
+    """
+    
+    # Parse content
+    if parse is None:
+        parse = parse_strings_file_content(content, file_path)
+    
+    # Record modifications for diagnositics
+    mods = []
+    
+    for key in generated_parse.keys():
+    
+        is_missing = key not in parse        
+        p = None if is_missing else parse[key]
+        g = generated_parse[key]
 
         if is_missing:
             
             # Insert kv-pair
-            parse[key] = g
+            parse[key] = dict(g) # Copy, since generated_parse is shared between translation files
             mods.append({'key': key, 'modtype': 'insert', 'value': g['comment'] + g['line']})
             
         else:
@@ -279,36 +567,43 @@ def updated_strings_file_content(content, generated_content, file_path, repo_roo
     
     # Validate parse
     
-    all_keys = set(parse.keys()).union(set(generated_parse.keys())) # For debugging
-    for l in all_keys:
-        l_comment = parse[l]['comment']
+    parse_keys = parse.keys()
+    generated_keys_view = generated_parse.keys()
+    
+    all_keys = parse_keys | generated_keys_view # For debugging
+    if strict and len(all_keys) > 0:
+        all_comments = '\0'.join(parse[l]['comment'] for l in all_keys) # Lets us search all comments for a key with a single substring search, instead of checking every key against every comment. Note: The \0 separator keeps matches from spanning two comments.
         for k in all_keys: # Idea: you could also check if the key appears in single\double quotes, or after linebreak to increase confidence that something is broken.
-            assert f"{k}" not in l_comment, f"The key {k} appears in the comment for key {l}. Something is probably broken in the parsing code. Not proceeding. Comment:\n\n{parse[l]['comment']}\n\n"
+            if f"{k}" in all_comments:
+                l = next(l for l in all_keys if f"{k}" in parse[l]['comment']) # Find the offending comment for the error message
+                assert False, f"The key {k} appears in the comment for key {l}. Something is probably broken in the parsing code. Not proceeding. Comment:\n\n{parse[l]['comment']}\n\n"
     
     # Reassemple parse into updated content
     
-    new_content = ''
+    new_content = [] # Note: We collect the parts of the new content in a list and join them at the end, instead of appending to a string over and over.
+    new_content_line_count = 0
     
     # Get new keys in order
     # Notes: 
     # - First, we attach unused kv-pairs, 
     #   so they are visible because they might need action
-    # - Second, we attach kv-pairs that also occur in generated_content
-    #   Note: dict.keys() are in insertion order in python. Therefore, this should synchronize the order of kv-pairs in the new_content with the generated_content
+    # - Second, we attach kv-pairs that also occur in generated_parse
+    #   Note: dict.keys() are in insertion order in python. Therefore, this should synchronize the order of kv-pairs in the new_content with the generated_parse
     
-    generated_keys = list(generated_parse.keys())
-    superfluous_keys = [k for k in parse.keys() if k not in generated_parse.keys()]
+    generated_keys = list(generated_keys_view)
+    superfluous_keys = [k for k in parse_keys if k not in generated_keys_view] # Note: Not using `parse_keys - generated_keys_view` here, since that would lose the order of the keys.
     new_keys = superfluous_keys + generated_keys
     
     # Attach
     
     for k in superfluous_keys:
         
-        new_content += parse[k]['comment']
-        new_content += parse[k]['line']
+        new_content.append(parse[k]['comment'])
+        new_content.append(parse[k]['line'])
+        new_content_line_count += parse[k]['comment'].count('\n') + parse[k]['line'].count('\n')
         
-        if '/en' in file_path or '/Base' in file_path: # I think checking for 'Base' here is unnecessary.
-            line_number = len(new_content.split('\n')) - 1
+        if is_development_language_file(file_path):
+            line_number = new_content_line_count
             xcwarn("This key isn't used in any source code files. Consider removing it from the development language Localizable.strings file. Explanation: The StateOfLocalization script compares translated Localizable.strings files against the development language Localizable.strings file and discrepancies are automatically published in the StateOfLocalization comment. So the developer only has to keep the development language Localizable.strings file in sync with the source code and the rest can be done by translators.",
                            f"{file_path}", f"{line_number}")
         
@@ -316,15 +611,17 @@ def updated_strings_file_content(content, generated_content, file_path, repo_roo
         
         # Note: the generated source code strings files (Localized.strings) don't have a leading linebreak, but the IB strings files do. Insert linebreak here to make things look nicer.
         if i == 0 and not parse[k]['comment'].startswith('\n'): 
-            new_content += '\n'
+            new_content.append('\n')
         
         # Attach main content
-        new_content += parse[k]['comment']
-        new_content += parse[k]['line']
+        new_content.append(parse[k]['comment'])
+        new_content.append(parse[k]['line'])
         
+    new_content = ''.join(new_content)
+    
     # Analyze reordering
     ordered_key_dict = {
-        'before': parse.keys(),
+        'before': list(parse.keys()), # Note: dict_keys can't be pickled
         'after': new_keys
     }
     
@@ -352,15 +649,6 @@ def parse_strings_file_content(content, file_path, remove_value=False):
     
     result = {}
     
-    kv_regex        = shared.strings_file_regex_kv_line()
-    comment_regex   = shared.strings_file_regex_comment_line()
-    blank_regex     = shared.strings_file_regex_blank_line()
-    
-    
-    #
-    # Approach 1: Line-based approach
-    #
-    
     """
     Notes:
     - On the line-based approach vs match-based approach:
@@ -374,102 +662,62 @@ def parse_strings_file_content(content, file_path, remove_value=False):
             - The match-based applies the regext for finding kv-pairs to the whole string, and then iterates through the matches.
             - This works fine, butttt if you forget to put a semicolon at the end, then it will consider the whole kv-pair part of a comment, and will simply delete it.
                 This has happened to me a few times when I was tired and I HATE this behaviour. That's why we're going back to the line-based approach with some additional checks to make sure everything is well-formatted.
+        - Update: We now apply kv_regex to the whole content again (so we only loop over kv-pairs instead of all lines in python), but we still validate every line between kv-pairs with invalid_line_regex. 
+            That way, a kv-pair with a missing semicolon still throws an error, just like in the line-based approach.
+            (The old match-based code without these checks was removed - see git history)
     - Somehow we seem to be replacing consecutive blank lines before and after comments with single blank lines in the output of the script. 
         That's nice, but I don't understand why it's happending. Might be coming from this function. Edit: It think it's just because we replace the comments and the comments from the generated content don't have double line breaks.
     """
     
-    def assert_full_match(match, line, name, line_number):
-        match_end_target = 0 if len(line) == 0 else len(line) - 1
-        
-        if not (match.start(0) == 0 and match.end(0) == match_end_target):
-            xcerror(f"Line is matched by {name}, but only partially. This means there is probably something weird with the syntax / formatting.",
-                           file_path, line_number)
+    def line_number_at(index):
+        return content.count('\n', 0, index) + 1
     
-    last_key_line_number = -1
-    last_key = ''
-    acc_comment = ''
-
-    lines = content.split('\n')
-    for i, line in enumerate(lines): # `True` preserves linebreaks, so that we can easily stitch everything together exactly as it was.
-        
-        if i != len(lines) - 1:
-            line += '\n'
-        
-        kv_match = kv_regex.match(line)
-
-        if kv_match:
-            
-            assert_full_match(kv_match, line, 'kv_regex', i+1)
-
-            key = kv_match.group(2)
-            if remove_value:
-                value_start = kv_match.start(3)
-                value_end = kv_match.end(3)
-                result_line = line[:value_start] + line[value_end:]
-            else:
-                result_line = line
-
-            result[key] = { "line": result_line, "comment": acc_comment }
-            acc_comment = ''
-
-            last_key = key
-            last_key_line_number = i+1
-        else:
-            comment_match = comment_regex.match(line)
-            blank_match = blank_regex.match(line)
-            
-            if comment_match:
-                assert_full_match(comment_match, line, 'comment_regex', i+1)
-            elif blank_match:
-                assert_full_match(blank_match, line, 'blank_regex', i+1)
-            else:
-                xcerror(f"Line doesn't match kv, comment, or blank line regex. That means there's probably something weird with the syntax / formatting.", file_path, i+1)
-            
-            acc_comment += line 
-
-    post_comment = acc_comment
-    if not len(post_comment.strip()) == 0: xcerror(f"There's content under the last key-value-pair (this line). Don't know what to do with that. Pls remove?", file_path, last_key_line_number)
+    def validate_comment(comment_start, comment_end):
+        # Make sure the text between two kv-pairs only consists of comment lines and blank lines.
+        #   This is what catches kv-pairs with a missing semicolon. Those aren't matched by kv_regex, so they end up in here.
+        invalid_match = invalid_line_regex.search(content, comment_start, comment_end)
+        if invalid_match:
+            xcerror(f"Line doesn't match kv, comment, or blank line regex. That means there's probably something weird with the syntax / formatting.", file_path, line_number_at(invalid_match.start(0)))
     
-    return result
-    
-    #
-    # Approach 2: Match-based
-    #
-    
-    last_match = None
-    last_key = ''
-    
-    matches = list(regex.finditer(content))
+    last_key_start = -1 # Note: We only turn this into a line number if we need it for an error, since counting lines means scanning the content up to here.
+    comment_start = 0
     
-    for match in matches:
+    for kv_match in kv_regex.finditer(content):
         
-        comment_start = last_match.end(0) if last_match else 0
-        comment_end = match.start(0)
-        comment = content[comment_start:comment_end]
+        line_start = kv_match.start(0)
+        line_end = kv_match.end(0) + 1 # Include the linebreak, so that we can easily stitch everything together exactly as it was.
         
-        line_start = match.start(0)
-        line_end = match.end(0)
-        line = match.group(0)
+        validate_comment(comment_start, line_start)
         
-        key = match.group(2)
+        if line_end > len(content):
+            xcerror(f"Line is matched by kv_regex, but only partially. This means there is probably something weird with the syntax / formatting.", file_path, line_number_at(line_start))
         
-        result_line = ''
+        key = kv_match.group(2)
         if remove_value:
-            value_start = match.start(3)
-            value_end = match.end(3)
+            value_start = kv_match.start(3)
+            value_end = kv_match.end(3)
             result_line = content[line_start:value_start] + content[value_end:line_end]
         else:
-            result_line = line
-        
-        assert key not in result, f"There's a duplicate key {key}"
-        result[key] = { "line": result_line, "comment": comment }
-        
-        last_key = key
-        last_match = match
-        
-    last_match = matches[-1]
-    assert len(content.rstrip()) == last_match.end(0), f"There's content under the last key {last_key}. Don't know what to do with that. Pls remove."
-    
+            result_line = content[line_start:line_end]
+        
+        result[key] = { "line": result_line, "comment": content[comment_start:line_start] }
+        comment_start = line_end
+        
+        last_key_start = line_start
+    
+    # Validate content under the last kv-pair
+    #   Note: The last line has no linebreak after it. Unless it's empty, the regexes can't fully match it - just like the other lines, which are matched without their linebreak.
+    last_line_start = content.rfind('\n') + 1
+    last_line = content[last_line_start:]
+    validate_comment(comment_start, last_line_start)
+    if len(last_line) > 0:
+        for name, regex in [('comment_regex', comment_regex), ('blank_regex', blank_regex)]:
+            if regex.match(last_line):
+                xcerror(f"Line is matched by {name}, but only partially. This means there is probably something weird with the syntax / formatting.", file_path, line_number_at(last_line_start))
+        xcerror(f"Line doesn't match kv, comment, or blank line regex. That means there's probably something weird with the syntax / formatting.", file_path, line_number_at(last_line_start))
+    
+    post_comment = content[comment_start:]
+    if not len(post_comment.strip()) == 0: xcerror(f"There's content under the last key-value-pair (this line). Don't know what to do with that. Pls remove?", file_path, line_number_at(last_key_start) if last_key_start != -1 else -1)
     
     return result
 